@@ -8,6 +8,7 @@ setup(
     entry_points={
         "console_scripts": [
             "connect4 = connect4.play:play",
+            "connect4-tablebase = connect4.tablebase:main",
         ]
     },
 )
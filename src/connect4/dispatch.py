@@ -0,0 +1,115 @@
+import copy
+import queue
+import threading
+from typing import Any
+
+from connect4.game import Connect4, Connect4Subscriber
+
+
+class BufferedConnect4Subscriber(Connect4Subscriber):
+    """
+    Wraps another Connect4Subscriber and delivers its notifications from a background thread.
+    The game only enqueues events, so slow subscribers (e.g. writing to a pipe or to disk) no
+    longer add to the latency of a move. Events are delivered in order by a single worker thread,
+    one event at a time. The queue is bounded: if the subscriber falls behind by more than
+    `maxsize` events, the game blocks until there is room again.
+    If the wrapped subscriber raises, its error is raised in the game thread on the next
+    notification, and the wrapper rejects all further events.
+    On notify_game_result, the queue is flushed before returning, such that the game only ends
+    after the wrapped subscriber has seen all events.
+    The background thread runs until `close` is called, so close it once it is no longer needed,
+    or use it as a context manager.
+    """
+
+    _STOP = object()
+
+    def __init__(self, subscriber: Connect4Subscriber, maxsize: int = 64):
+        if maxsize <= 0:
+            raise ValueError(
+                "maxsize must be positive to keep the event queue bounded."
+            )
+        self.subscriber = subscriber
+        # events are tuples of method name and arguments, or the _STOP marker
+        self._queue: queue.Queue[Any] = queue.Queue(maxsize=maxsize)
+        self._error: BaseException | None = None
+        self._error_reported = False
+        self._worker = threading.Thread(target=self._run, daemon=True)
+        self._worker.start()
+
+    def _snapshot(self, game: Connect4) -> Connect4:
+        # The game keeps moving while events wait in the queue, therefore the board is copied
+        # at the time of the event. Players and subscribers are shared with the original.
+        snapshot = copy.copy(game)
+        snapshot.board = [list(col) for col in game.board]
+        return snapshot
+
+    def _run(self):
+        while True:
+            # one event at a time, such that the queue holds all undelivered events and
+            # `maxsize` is the actual limit
+            event = self._queue.get()
+            if event is self._STOP:
+                # close() enqueues the stop marker last, so nothing is left behind it.
+                self._queue.task_done()
+                return
+            method_name, args = event
+            # after a failure, skip delivery but keep consuming so that flush() returns.
+            # BaseException (e.g. SystemExit) is caught too, as it would otherwise end the
+            # thread and leave flush() waiting forever. It is re-raised in the game thread.
+            if self._error is None:
+                try:
+                    getattr(self.subscriber, method_name)(*args)
+                except BaseException as e:
+                    self._error = e
+            self._queue.task_done()
+
+    def _put(self, method_name, *args):
+        self._raise_pending_error()
+        if not self._worker.is_alive():
+            raise RuntimeError(f"{self.__class__.__name__} is already closed.")
+        self._queue.put((method_name, args))
+
+    def _raise_pending_error(self):
+        # Once the wrapped subscriber failed, the wrapper stays failed, since the subscriber
+        # would otherwise see a stream of events with a gap. The error itself is raised once,
+        # afterwards a RuntimeError refers to it.
+        if self._error is None:
+            return
+        if not self._error_reported:
+            self._error_reported = True
+            raise self._error
+        raise RuntimeError(
+            f"{self.__class__.__name__} failed on an earlier event."
+        ) from self._error
+
+    def flush(self):
+        """Block until all queued events are delivered. Raises if the wrapped subscriber failed."""
+        self._queue.join()
+        self._raise_pending_error()
+
+    def close(self):
+        """Deliver all pending events and stop the background thread.
+        Raises the error of the wrapped subscriber, unless it was already raised before."""
+        if self._worker.is_alive():
+            self._queue.put(self._STOP)
+            self._worker.join()
+        if not self._error_reported:
+            self._raise_pending_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def notify_board_updated(self, game, player, move):
+        """Enqueue the update with a snapshot of the board at the time of the move."""
+        self._put("notify_board_updated", self._snapshot(game), player, move)
+
+    def notify_game_result(self, game, result):
+        """Enqueue the result and wait until it and all previous events are delivered."""
+        self._put("notify_game_result", self._snapshot(game), result)
+        self.flush()
+
+    def notify_game_start(self, game):
+        self._put("notify_game_start", self._snapshot(game))
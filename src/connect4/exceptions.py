@@ -4,3 +4,7 @@ class InvalidMoveException(ValueError):
 
 class GameNotSupportedException(ValueError):
     pass
+
+
+class InvalidTablebaseException(ValueError):
+    pass
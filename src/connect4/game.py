@@ -32,10 +32,15 @@ class Connect4:
     _ncols: int
     subscribers: list[Connect4Subscriber]
 
-    def __init__(self, player1: Player, player2: Player):
-        "Provide any 2 players implementing strategies for the connect 4 game."
-        self._nrows = 6
-        self._ncols = 7
+    def __init__(
+        self, player1: Player, player2: Player, *, ncols: int = 7, nrows: int = 6
+    ):
+        """Provide any 2 players implementing strategies for the connect 4 game.
+        The board size defaults to the classic 7 columns and 6 rows."""
+        if ncols <= 0 or nrows <= 0:
+            raise ValueError(f"A board of {ncols}x{nrows} is not supported.")
+        self._nrows = nrows
+        self._ncols = ncols
         self.board = [([" "] * self._nrows) for _ in range(self._ncols)]
         self._next_player = "x"
         self.subscribers = []
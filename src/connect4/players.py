@@ -7,6 +7,7 @@ from connect4.exceptions import GameNotSupportedException
 
 if TYPE_CHECKING:
     from connect4.play import Connect4
+    from connect4.tablebase import Connect4Tablebase
 
 
 class Player:
@@ -62,6 +63,33 @@ class RandomConnect4ComputerPlayer(ComputerPlayer):
         return moves[move_idx]
 
 
+class TablebaseConnect4ComputerPlayer(RandomConnect4ComputerPlayer):
+    """Plays perfectly whenever all positions after its valid moves are in the tablebase.
+    Otherwise, e.g. early in the game, picks a random valid move."""
+
+    def __init__(self, tablebase: "Connect4Tablebase"):
+        super().__init__()
+        self.tablebase = tablebase
+
+    def check_is_supported_game(self, game: Any):
+        super().check_is_supported_game(game)
+        if (game.ncols, game.nrows) != (self.tablebase.ncols, self.tablebase.nrows):
+            errtxt = f"The tablebase is for a {self.tablebase.ncols}x{self.tablebase.nrows} board, "
+            errtxt += f"not for {game.ncols}x{game.nrows}."
+            raise GameNotSupportedException(errtxt)
+
+    def init_game(self, game):
+        # The tablebase only holds positions of one board size.
+        self.check_is_supported_game(game)
+
+    def get_next_move(self, game: "Connect4", player):
+        """Pick the best move according to the tablebase, falling back to a random move."""
+        scores = self.tablebase.score_moves(game.board, player)
+        if scores is None:
+            return super().get_next_move(game, player)
+        return max(scores, key=scores.__getitem__)
+
+
 class HumanConnect4Player(Player):
     def __init__(self, io_provider):
         super().__init__()
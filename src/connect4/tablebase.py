@@ -0,0 +1,292 @@
+"""Endgame tablebase for connect four.
+
+A tablebase stores the exact value of every reachable, undecided position with at most `max_empty`
+empty slots. Values are given from the perspective of the player to move: a positive value means
+the player to move wins, and it is larger the earlier the win (it is the number of empty slots
+just before the winning move). Negative values are losses accordingly and 0 is a draw.
+
+Positions are keyed by a bitboard encoding (see `_key`) and stored as a sorted array of keys with
+a parallel array of values. On disk, this is a small header followed by both arrays, such that a
+saved tablebase can be memory-mapped and probed by binary search without being loaded into memory.
+
+The tablebase is computed by exhaustively enumerating all positions reachable from the empty
+board, which is feasible for small boards (e.g. 5 columns and 4 rows) but not for the classic 7x6.
+"""
+
+import argparse
+import bisect
+import mmap
+import os
+import struct
+import sys
+from array import array
+
+from connect4.exceptions import InvalidTablebaseException
+
+# magic, byte order of the arrays ("l" or "b"), ncols, nrows, max_empty, number of entries
+_HEADER = struct.Struct("<8scHHHxQ")
+_MAGIC = b"C4TBASE1"
+
+
+def _bottom_mask(ncols: int, nrows: int) -> int:
+    return sum(1 << (col * (nrows + 1)) for col in range(ncols))
+
+
+def _key(position: int, mask: int, bottom: int) -> int:
+    # Per column, the key contains the stones of the player to move, topped with a single bit
+    # above the highest stone. The marker bit fixes the height of each column and the stones lie
+    # below it without carrying into it, so the key alone identifies the position.
+    return position + mask + bottom
+
+
+def _is_aligned(position: int, nrows: int) -> bool:
+    # Each column has one spare bit on top, such that shifts do not wrap into the next column.
+    # Check vertical, horizontal, diagonal (ascending) and diagonal (descending) connections.
+    for shift in (1, nrows + 1, nrows + 2, nrows):
+        pairs = position & (position >> shift)
+        if pairs & (pairs >> (2 * shift)):
+            return True
+    return False
+
+
+def _board_to_bitboard(
+    board: list[list[str]], nrows: int, player: str
+) -> tuple[int, int]:
+    """Convert a Connect4 board (a list per column) to the stones of `player` and all stones."""
+    position = 0
+    mask = 0
+    for col, slots in enumerate(board):
+        for row, label in enumerate(slots):
+            if label != " ":
+                bit = 1 << (col * (nrows + 1) + row)
+                mask |= bit
+                if label == player:
+                    position |= bit
+    return position, mask
+
+
+class Connect4Tablebase:
+    """Holds the values of positions as sorted keys and values, either in memory or memory-mapped from a file."""
+
+    def __init__(
+        self, *, ncols: int, nrows: int, max_empty: int, keys, values, mapped_file=None
+    ):
+        if ncols * (nrows + 1) > 64:
+            raise InvalidTablebaseException(
+                f"A board of {ncols}x{nrows} does not fit the 64-bit keys."
+            )
+        self.ncols = ncols
+        self.nrows = nrows
+        self.max_empty = max_empty
+        self._keys = keys
+        self._values = values
+        self._mapped_file = mapped_file
+        self._closed = False
+        self._bottom = _bottom_mask(ncols, nrows)
+
+    def _check_not_closed(self):
+        # a closed table must not answer None, which would read as a missing position
+        if self._closed:
+            raise ValueError("The tablebase is closed.")
+
+    def __len__(self):
+        self._check_not_closed()
+        return len(self._keys)
+
+    def probe(self, position: int, mask: int) -> int | None:
+        """Look up the value of a position for the player to move, or None if it is not in the table."""
+        self._check_not_closed()
+        key = _key(position, mask, self._bottom)
+        idx = bisect.bisect_left(self._keys, key)
+        if idx < len(self._keys) and self._keys[idx] == key:
+            return self._values[idx]
+        return None
+
+    def score_moves(self, board: list[list[str]], player: str) -> dict[int, int] | None:
+        """Score all valid moves of `player` on the given board, the higher the better.
+        Returns None if the position after any of the moves is not in the table."""
+        position, mask = _board_to_bitboard(board, self.nrows, player)
+        empty = self.ncols * self.nrows - mask.bit_count()
+        scores = {}
+        for col in range(self.ncols):
+            col_mask = ((1 << self.nrows) - 1) << (col * (self.nrows + 1))
+            if mask & col_mask == col_mask:
+                continue
+            new_mask = mask | (mask + (1 << (col * (self.nrows + 1))))
+            if _is_aligned(position | (new_mask ^ mask), self.nrows):
+                scores[col] = empty
+                continue
+            # after the move, the opponent is to move and their stones are the remaining ones
+            value = self.probe(position ^ mask, new_mask)
+            if value is None:
+                return None
+            scores[col] = -value
+        return scores
+
+    def save(self, path: str):
+        """Write the table to a file that can be memory-mapped by `load`."""
+        with open(path, "wb") as f:
+            byte_order = sys.byteorder[0].encode()
+            f.write(
+                _HEADER.pack(
+                    _MAGIC,
+                    byte_order,
+                    self.ncols,
+                    self.nrows,
+                    self.max_empty,
+                    len(self),
+                )
+            )
+            array("Q", self._keys).tofile(f)
+            array("b", self._values).tofile(f)
+
+    @classmethod
+    def load(cls, path: str) -> "Connect4Tablebase":
+        """Memory-map a table written by `save`. Keys and values are stored in native byte order."""
+        with open(path, "rb") as f:
+            # checked before mapping, since empty files cannot be memory-mapped
+            if os.fstat(f.fileno()).st_size < _HEADER.size:
+                raise InvalidTablebaseException(
+                    f"{path} is too short to be a tablebase."
+                )
+            mapped_file = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, byte_order, ncols, nrows, max_empty, count = _HEADER.unpack_from(
+            mapped_file
+        )
+        keys_start = _HEADER.size
+        keys_end = keys_start + 8 * count
+        if (
+            magic != _MAGIC
+            or len(mapped_file) != keys_end + count
+            or not 0 < ncols * (nrows + 1) <= 64
+        ):
+            mapped_file.close()
+            raise InvalidTablebaseException(f"{path} is not a valid tablebase.")
+        if byte_order != sys.byteorder[0].encode():
+            mapped_file.close()
+            raise InvalidTablebaseException(
+                f"{path} was written on a machine with a different byte order."
+            )
+        view = memoryview(mapped_file)
+        keys = view[keys_start:keys_end].cast("Q")
+        values = view[keys_end:].cast("b")
+        return cls(
+            ncols=ncols,
+            nrows=nrows,
+            max_empty=max_empty,
+            keys=keys,
+            values=values,
+            mapped_file=mapped_file,
+        )
+
+    def close(self):
+        """Release the memory-mapped file, if any. Probing a closed table raises a ValueError."""
+        if self._mapped_file is not None:
+            self._keys.release()
+            self._values.release()
+            self._mapped_file.close()
+            self._mapped_file = None
+        self._closed = True
+
+
+def build_tablebase(*, ncols: int, nrows: int, max_empty: int) -> Connect4Tablebase:
+    """Compute the values of all reachable undecided positions with at most `max_empty` empty slots."""
+    # checked upfront, as the enumeration may take long before the table is constructed
+    if ncols <= 0 or nrows <= 0:
+        raise ValueError(f"A board of {ncols}x{nrows} is not supported.")
+    if ncols * (nrows + 1) > 64:
+        raise ValueError(f"A board of {ncols}x{nrows} does not fit the 64-bit keys.")
+    if not 0 <= max_empty <= ncols * nrows:
+        raise ValueError(f"max_empty must be between 0 and {ncols * nrows}.")
+    bottom = _bottom_mask(ncols, nrows)
+    ncells = ncols * nrows
+    moves = [
+        (1 << (col * (nrows + 1)), ((1 << nrows) - 1) << (col * (nrows + 1)))
+        for col in range(ncols)
+    ]
+    shifts = [(shift, 2 * shift) for shift in (1, nrows + 1, nrows + 2, nrows)]
+    table: dict[int, int] = {}
+    visited: set[int] = set()
+
+    def children(position, mask):
+        # yields whether the move wins and the position after the move, as seen by the opponent.
+        # This is the hot loop of the computation, hence _is_aligned is inlined.
+        for col_bottom, col_mask in moves:
+            if mask & col_mask == col_mask:
+                continue
+            new_mask = mask | (mask + col_bottom)
+            stones = position | (new_mask ^ mask)
+            wins = False
+            for shift, double_shift in shifts:
+                pairs = stones & (stones >> shift)
+                if pairs & (pairs >> double_shift):
+                    wins = True
+                    break
+            yield wins, position ^ mask, new_mask
+
+    def solve(position, mask, empty):
+        key = _key(position, mask, bottom)
+        value = table.get(key)
+        if value is not None:
+            return value
+        # a full board without a winner is a draw. Otherwise, any move beats the initial value.
+        value = 0 if empty == 0 else -ncells
+        for wins, child_position, child_mask in children(position, mask):
+            # a winning move is the best move, but the other moves still lead to reachable positions
+            child_value = (
+                empty if wins else -solve(child_position, child_mask, empty - 1)
+            )
+            if child_value > value:
+                value = child_value
+        table[key] = value
+        return value
+
+    def enumerate_positions(position, mask, empty):
+        # above the threshold, only walk the game tree to find the reachable positions
+        if empty <= max_empty:
+            solve(position, mask, empty)
+            return
+        key = _key(position, mask, bottom)
+        if key in visited:
+            return
+        visited.add(key)
+        for wins, child_position, child_mask in children(position, mask):
+            if not wins:
+                enumerate_positions(child_position, child_mask, empty - 1)
+
+    enumerate_positions(0, 0, ncells)
+    keys = array("Q", sorted(table))
+    values = array("b", (table[key] for key in keys))
+    return Connect4Tablebase(
+        ncols=ncols, nrows=nrows, max_empty=max_empty, keys=keys, values=values
+    )
+
+
+def main(argv: list[str] | None = None):
+    parser = argparse.ArgumentParser(
+        description="Compute an endgame tablebase for connect four."
+    )
+    parser.add_argument("output", help="File to write the tablebase to.")
+    parser.add_argument("--ncols", type=int, default=5)
+    parser.add_argument("--nrows", type=int, default=4)
+    parser.add_argument(
+        "--max-empty",
+        type=int,
+        default=None,
+        help="Only store positions with at most this many empty slots.",
+    )
+    args = parser.parse_args(argv)
+    max_empty = args.ncols * args.nrows if args.max_empty is None else args.max_empty
+
+    try:
+        tablebase = build_tablebase(
+            ncols=args.ncols, nrows=args.nrows, max_empty=max_empty
+        )
+    except ValueError as e:
+        parser.error(str(e))
+    tablebase.save(args.output)
+    print(f"Wrote {len(tablebase)} positions to {args.output}.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,24 @@
+import random
+import sys
+import threading
+import time
+
 import pytest
 
-from connect4.game import Connect4
-from connect4.players import HumanConnect4Player, RandomConnect4ComputerPlayer
+from connect4.dispatch import BufferedConnect4Subscriber
+from connect4.exceptions import GameNotSupportedException, InvalidTablebaseException
+from connect4.game import Connect4, Connect4Subscriber
+from connect4.players import (
+    HumanConnect4Player,
+    RandomConnect4ComputerPlayer,
+    TablebaseConnect4ComputerPlayer,
+)
+from connect4.tablebase import (
+    _HEADER,
+    Connect4Tablebase,
+    _board_to_bitboard,
+    build_tablebase,
+)
 from connect4.terminal import (
     CapturedMockInputConnect4TextTerminal,
     Connect4TextTerminal,
@@ -211,3 +228,273 @@ class TestRequirements:
 
     def test_ask_and_update(self):
         pass
+
+
+class RecordingSubscriber(Connect4Subscriber):
+    """Records all notifications, optionally sleeping to emulate slow i/o."""
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.events = []
+
+    def notify_board_updated(self, game, player, move):
+        time.sleep(self.delay)
+        self.events.append(("update", player, move, [list(col) for col in game.board]))
+
+    def notify_game_result(self, game, result):
+        time.sleep(self.delay)
+        self.events.append(("result", result))
+
+    def notify_game_start(self, game):
+        time.sleep(self.delay)
+        self.events.append(("start",))
+
+
+class TestBufferedConnect4Subscriber:
+    def test_same_events_as_synchronous(self):
+        c4 = Connect4(RandomConnect4ComputerPlayer(), RandomConnect4ComputerPlayer())
+        direct = RecordingSubscriber()
+        buffered = RecordingSubscriber(delay=0.001)
+        c4.subscribe(direct)
+        with BufferedConnect4Subscriber(buffered, maxsize=4) as buffered_subscriber:
+            c4.subscribe(buffered_subscriber)
+            c4.play()
+
+        # notify_game_result flushes, so all events are delivered once play() returns
+        assert buffered.events == direct.events
+        assert buffered.events[0] == ("start",)
+        assert buffered.events[-1][0] == "result"
+
+    @pytest.mark.parametrize("error_cls", [KeyError, SystemExit])
+    def test_subscriber_error_is_raised(self, error_cls):
+        class FailingSubscriber(RecordingSubscriber):
+            def notify_board_updated(self, game, player, move):
+                raise error_cls(move)
+
+        c4 = Connect4(RandomConnect4ComputerPlayer(), RandomConnect4ComputerPlayer())
+        with BufferedConnect4Subscriber(FailingSubscriber()) as buffered_subscriber:
+            c4.subscribe(buffered_subscriber)
+            with pytest.raises(error_cls):
+                c4.play()
+
+    def test_slow_subscriber_does_not_block_until_queue_full(self):
+        class BlockingSubscriber(RecordingSubscriber):
+            def __init__(self):
+                super().__init__()
+                self.started = threading.Event()
+                self.release = threading.Event()
+
+            def notify_board_updated(self, game, player, move):
+                self.started.set()
+                assert self.release.wait(timeout=5)
+                super().notify_board_updated(game, player, move)
+
+        c4 = Connect4(RandomConnect4ComputerPlayer(), RandomConnect4ComputerPlayer())
+        blocking = BlockingSubscriber()
+        accepted = []
+
+        def produce(buffered_subscriber):
+            for move in range(6):
+                buffered_subscriber.notify_board_updated(c4, "x", move)
+                accepted.append(move)
+
+        with BufferedConnect4Subscriber(blocking, maxsize=4) as buffered_subscriber:
+            producer = threading.Thread(target=produce, args=(buffered_subscriber,))
+            producer.start()
+            # the worker is stuck on the first event, the producer returns for 4 more
+            assert blocking.started.wait(timeout=5)
+            deadline = time.monotonic() + 5
+            while len(accepted) < 5 and time.monotonic() < deadline:
+                time.sleep(0.001)
+            time.sleep(0.05)
+            assert accepted == [0, 1, 2, 3, 4]
+            assert producer.is_alive()
+
+            blocking.release.set()
+            producer.join(timeout=5)
+            assert accepted == [0, 1, 2, 3, 4, 5]
+            buffered_subscriber.flush()
+        assert [event[2] for event in blocking.events] == [0, 1, 2, 3, 4, 5]
+
+    def test_stays_failed_after_error(self):
+        class FailOnceSubscriber(RecordingSubscriber):
+            def notify_game_start(self, game):
+                if not self.events:
+                    self.events.append(("failed",))
+                    raise KeyError("start")
+                super().notify_game_start(game)
+
+        recorder = FailOnceSubscriber()
+        c4 = Connect4(RandomConnect4ComputerPlayer(), RandomConnect4ComputerPlayer())
+        with BufferedConnect4Subscriber(recorder) as buffered_subscriber:
+            buffered_subscriber.notify_game_start(c4)
+            with pytest.raises(KeyError):
+                buffered_subscriber.flush()
+            with pytest.raises(RuntimeError):
+                buffered_subscriber.notify_game_start(c4)
+            with pytest.raises(RuntimeError):
+                buffered_subscriber.flush()
+        assert recorder.events == [("failed",)]
+
+    def test_close(self):
+        recorder = RecordingSubscriber()
+        buffered = BufferedConnect4Subscriber(recorder)
+        c4 = Connect4(RandomConnect4ComputerPlayer(), RandomConnect4ComputerPlayer())
+        buffered.notify_game_start(c4)
+        buffered.close()
+        assert recorder.events == [("start",)]
+        with pytest.raises(RuntimeError):
+            buffered.notify_game_start(c4)
+
+
+@pytest.fixture(scope="module")
+def tablebase_4x4():
+    return build_tablebase(ncols=4, nrows=4, max_empty=16)
+
+
+@pytest.fixture(scope="module")
+def tablebase_5x4():
+    # solving the 5x4 board takes about 20 seconds, tests using it are marked as slow
+    return build_tablebase(ncols=5, nrows=4, max_empty=20)
+
+
+@pytest.fixture
+def seeded_random():
+    # the random computer player uses the global random module, restore it afterwards
+    state = random.getstate()
+    random.seed(0)
+    yield
+    random.setstate(state)
+
+
+def negamax(c4, empty):
+    # brute force reference using the game's own rules, same value convention as the tablebase
+    value = 0 if empty == 0 else -c4.ncols * c4.nrows
+    for move in RandomConnect4ComputerPlayer()._list_valid_moves(c4):
+        row = c4.board[move].index(" ")
+        c4._update_board(move)
+        if c4._check_board() == c4._next_player:
+            child_value = empty
+        else:
+            c4._end_turn()
+            child_value = -negamax(c4, empty - 1)
+            c4._end_turn()
+        c4.board[move][row] = " "
+        value = max(value, child_value)
+    return value
+
+
+@pytest.mark.parametrize(["ncols", "nrows"], [(0, 6), (7, -1)])
+def test_invalid_board_size(ncols, nrows):
+    with pytest.raises(ValueError):
+        Connect4(
+            RandomConnect4ComputerPlayer(),
+            RandomConnect4ComputerPlayer(),
+            ncols=ncols,
+            nrows=nrows,
+        )
+
+
+class TestTablebase:
+    def test_empty_board_is_draw(self, tablebase_4x4):
+        assert tablebase_4x4.probe(0, 0) == 0
+        assert tablebase_4x4.score_moves([[" "] * 4 for _ in range(4)], "x") == {
+            0: 0,
+            1: 0,
+            2: 0,
+            3: 0,
+        }
+
+    def test_matches_negamax(self, tablebase_4x4):
+        rng = random.Random(0)
+        for _ in range(20):
+            c4 = Connect4(
+                RandomConnect4ComputerPlayer(),
+                RandomConnect4ComputerPlayer(),
+                nrows=4,
+                ncols=4,
+            )
+            # play random moves until 7 slots are left, restarting if the game is decided on the way
+            while sum(col.count(" ") for col in c4.board) > 7 and c4._is_undecided():
+                c4._apply_move(
+                    rng.choice(RandomConnect4ComputerPlayer()._list_valid_moves(c4))
+                )
+            if not c4._is_undecided():
+                continue
+            position, mask = _board_to_bitboard(c4.board, c4.nrows, c4._next_player)
+            assert tablebase_4x4.probe(position, mask) == negamax(c4, 7)
+
+    def test_save_load(self, tablebase_4x4, tmp_path):
+        path = tmp_path / "4x4.c4tb"
+        tablebase_4x4.save(str(path))
+        loaded = Connect4Tablebase.load(str(path))
+        assert (loaded.ncols, loaded.nrows, loaded.max_empty) == (4, 4, 16)
+        assert len(loaded) == len(tablebase_4x4)
+        board = str_to_board("+0123+\n|    |\n|    |\n| o  |\n|xxo |\n+----+")
+        assert loaded.score_moves(board, "x") == tablebase_4x4.score_moves(board, "x")
+        assert loaded.score_moves(board, "x") is not None
+        loaded.close()
+        with pytest.raises(ValueError):
+            loaded.score_moves(board, "x")
+
+    def test_load_invalid(self, tmp_path):
+        path = tmp_path / "invalid.c4tb"
+        path.write_bytes(b"not a tablebase" * 4)
+        with pytest.raises(InvalidTablebaseException):
+            Connect4Tablebase.load(str(path))
+        path.write_bytes(b"")
+        with pytest.raises(InvalidTablebaseException):
+            Connect4Tablebase.load(str(path))
+        # a well-formed header of a board too large for the keys
+        byte_order = sys.byteorder[0].encode()
+        path.write_bytes(_HEADER.pack(b"C4TBASE1", byte_order, 20, 20, 0, 0))
+        with pytest.raises(InvalidTablebaseException):
+            Connect4Tablebase.load(str(path))
+
+    @pytest.mark.parametrize(
+        ["ncols", "nrows", "max_empty"],
+        [(4, 4, -1), (4, 4, 17), (9, 7, 0), (0, 4, 0), (4, -1, 0)],
+    )
+    def test_build_invalid(self, ncols, nrows, max_empty):
+        with pytest.raises(ValueError):
+            build_tablebase(ncols=ncols, nrows=nrows, max_empty=max_empty)
+
+    @pytest.mark.slow
+    def test_solve_5x4(self, tablebase_5x4):
+        assert tablebase_5x4.score_moves([[" "] * 4 for _ in range(5)], "x") == {
+            0: -1,
+            1: 0,
+            2: 0,
+            3: 0,
+            4: -1,
+        }
+
+
+class TestTablebaseConnect4ComputerPlayer:
+    @pytest.mark.parametrize(
+        ["tablebase_fixture", "ncols"],
+        [
+            ("tablebase_4x4", 4),
+            pytest.param("tablebase_5x4", 5, marks=pytest.mark.slow),
+        ],
+    )
+    def test_never_loses(self, request, seeded_random, tablebase_fixture, ncols):
+        tablebase = request.getfixturevalue(tablebase_fixture)
+        for first in (True, False):
+            for _ in range(10):
+                perfect = TablebaseConnect4ComputerPlayer(tablebase)
+                players = (perfect, RandomConnect4ComputerPlayer())
+                c4 = Connect4(
+                    *(players if first else reversed(players)), ncols=ncols, nrows=4
+                )
+                recorder = RecordingSubscriber()
+                c4.subscribe(recorder)
+                c4.play()
+                assert recorder.events[-1][1] in ("tied", "x" if first else "o")
+
+    def test_board_size_mismatch(self, tablebase_4x4):
+        with pytest.raises(GameNotSupportedException):
+            Connect4(
+                TablebaseConnect4ComputerPlayer(tablebase_4x4),
+                RandomConnect4ComputerPlayer(),
+            )